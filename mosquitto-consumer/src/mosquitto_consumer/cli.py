@@ -1,13 +1,34 @@
-from datetime import datetime, timezone
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Optional
 
 import click
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
-from mosquitto_consumer.config.exceptions import SqlClientError
+from mosquitto_consumer.config.enums import ProvisioningAction
+from mosquitto_consumer.config.exceptions import ArchiveError, ManifestError, SqlClientError, StalePlanError
 from mosquitto_consumer.config.logs import logger
+from mosquitto_consumer.config.settings import settings
 from mosquitto_consumer.database.models import Plant, RecommendedPlantMoisture
 from mosquitto_consumer.database.sql_client import sql_client
+from mosquitto_consumer.utils.archive_utils import archive_moisture_logs, month_start
+from mosquitto_consumer.utils.plants_utils import build_topic
+from mosquitto_consumer.utils.provisioning_utils import (
+    PlantManifest,
+    ProvisioningPlan,
+    apply_provisioning,
+    load_manifest,
+    plan_provisioning,
+)
+
+PROVISIONING_ACTION_COLOURS: Dict[ProvisioningAction, str] = {
+    ProvisioningAction.CREATE: "green",
+    ProvisioningAction.RENAME: "yellow",
+    ProvisioningAction.MOVE: "yellow",
+    ProvisioningAction.DEPRECATE: "red",
+    ProvisioningAction.ACTIVATE: "green",
+    ProvisioningAction.SET_RANGE: "yellow",
+}
 
 
 @click.group
@@ -33,7 +54,7 @@ def cli() -> None:
 )
 def add(plant_name: str, topic_plant_name: str, topic_plant_location: str) -> None:
     """Add a plant to the plants table."""
-    topic: str = f"plant-monitoring/{topic_plant_location}/{topic_plant_name}/telemetry"
+    topic: str = build_topic(topic_plant_location, topic_plant_name)
 
     click.echo("\nAdding plant with the following details:")
     click.echo(f"  Name:  {plant_name}")
@@ -167,5 +188,91 @@ def setrange(plant_id: int) -> None:
         f"and maximum to {maximum_moisture_perc}"
     )
 
+@cli.command
+@click.option(
+    "--older_than_days",
+    type=click.IntRange(min=1),
+    default=365,
+    show_default=True,
+    help="Archive moisture logs from calendar months that ended at least this many days ago."
+)
+def archive(older_than_days: int) -> None:
+    """Move old moisture logs to compressed Parquet files."""
+    before: datetime = datetime.now(timezone.utc) - timedelta(days=older_than_days)
+
+    click.echo("\nArchiving moisture logs with the following details:")
+    click.echo(f"  Before:    {month_start(before):%Y-%m-%d}")
+    click.echo(f"  Directory: {settings.ARCHIVE_DIRECTORY}")
+    click.confirm("Archived rows will be deleted from the database. Do you want to continue?", abort=True)
+
+    try:
+        archived_range_count: int = archive_moisture_logs(before)
+    except ArchiveError:
+        click.secho("Error: Archiving stopped. Ranges that were not archived remain in the database.", fg="red")
+        raise
+
+    click.echo(f"Successfully archived {archived_range_count} monthly ranges.")
+
+@cli.command
+@click.option(
+    "-f",
+    "--file",
+    "manifest_path",
+    required=True,
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    help="YAML manifest with a 'plants' list. Each plant takes the options of 'consu add', " \
+        "and optionally is_deprecated, min_moisture_perc and max_moisture_perc."
+)
+@click.option(
+    "--prune",
+    is_flag=True,
+    help="Deprecate active plants that are not in the manifest."
+)
+@click.option(
+    "--dry_run",
+    is_flag=True,
+    help="Print the planned changes without applying them."
+)
+def apply(manifest_path: Path, prune: bool, dry_run: bool) -> None:
+    """Add, update and deprecate plants in bulk from a manifest file."""
+    try:
+        manifest: PlantManifest = load_manifest(manifest_path)
+    except ManifestError as exception:
+        raise click.BadParameter(str(exception.__cause__), param_hint="'--file'") from exception
+
+    try:
+        plan: ProvisioningPlan = plan_provisioning(manifest, prune=prune)
+    except ManifestError as exception:
+        raise click.BadParameter(str(exception), param_hint="'--file'") from exception
+
+    if not plan.changes:
+        click.echo("No changes. Plants already match the manifest.")
+        return
+
+    click.echo(f"\nPlanned changes for {len(manifest.plants)} plants in the manifest:")
+    for change in plan.changes:
+        click.secho(
+            f"  {change.action:<10} {change.detail:<30} {change.topic}",
+            fg=PROVISIONING_ACTION_COLOURS[change.action]
+        )
+
+    if dry_run:
+        click.echo(f"\nDry run. {len(plan.changes)} changes not applied.")
+        return
+
+    click.confirm("Do you want to continue?", abort=True)
+    try:
+        apply_provisioning(manifest, plan, prune=prune)
+    except StalePlanError:
+        click.secho("Error: Plants changed since the plan was printed. No changes applied, run again.", fg="red")
+        raise
+    except IntegrityError:
+        logger.error("One of the values provided matches an existing value in the table. Record not created.")
+        raise
+
+    click.echo(f"Successfully applied {len(plan.changes)} changes.")
+    if any(change.action in (ProvisioningAction.CREATE, ProvisioningAction.MOVE) for change in plan.changes):
+        click.secho("Warning: Container must be restarted to receive messages from new topics.", fg="yellow")
+
 if __name__ == "__main__":
     cli()
@@ -8,6 +8,7 @@ class TableNames(StrEnum):
 
     PLANTS = auto()
     PLANTS_MOISTURE_LOG = auto()
+    PLANTS_MOISTURE_LOG_ARCHIVES = auto()
     RECOMMENDED_PLANT_MOISTURE = auto()
 
 class MosquittoSubscribeMethod(Enum):
@@ -16,3 +17,15 @@ class MosquittoSubscribeMethod(Enum):
     AT_MOST_ONCE = 0
     AT_LEAST_ONCE = 1
     EXACTLY_ONCE = 2
+
+class ProvisioningAction(StrEnum):
+    """String enums for changes planned by a provisioning manifest."""
+
+    _value_: auto
+
+    CREATE = auto()
+    RENAME = auto()
+    MOVE = auto()
+    DEPRECATE = auto()
+    ACTIVATE = auto()
+    SET_RANGE = auto()
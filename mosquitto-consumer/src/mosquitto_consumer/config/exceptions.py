@@ -45,6 +45,48 @@ class SqlQueryError(SqlClientError):
         self.query = query
         super().__init__(f"Error while executing query: {self.query}")
 
+# Archive errors
+class ArchiveError(Exception):
+    """Inherit by all exceptions raised while archiving or reading archived telemetry."""
+
+    pass
+
+class ArchiveVerificationError(ArchiveError):
+    """Raise when an archive file does not match the rows it was exported from."""
+
+    pass
+
+# Provisioning errors
+class ProvisioningError(Exception):
+    """Inherit by all exceptions raised while provisioning plants from a manifest."""
+
+    pass
+
+class ManifestError(ProvisioningError):
+    """Raise when a provisioning manifest cannot be read or does not match the manifest format."""
+
+    pass
+
+class PlantNameConflictError(ManifestError):
+    """Raise when a manifest gives a plant the name of an existing plant that is not in the manifest."""
+
+    def __init__(self, plant_names: list[str]) -> None:
+        """Generate the message and call base class constructor.
+
+        Args:
+            plant_names (list[str]): The conflicting plant names.
+
+        """
+        self.plant_names = plant_names
+        super().__init__(
+            f"Plant names already used by plants that are not in the manifest: {', '.join(self.plant_names)}"
+        )
+
+class StalePlanError(ProvisioningError):
+    """Raise when the plants tables changed between printing a provisioning plan and applying it."""
+
+    pass
+
 # Mqtt consumer errors
 class MqttConsumerError(Exception):
     """Inherit by all exceptions raised by mqtt consumer."""
@@ -65,3 +107,13 @@ class MqttBrokerConnectionError(MqttConsumerError):
     """Raise when mosquitto encounters an error while connecting to the specified client."""
 
     pass
+
+class BackpressureConfigurationError(MqttConsumerError):
+    """Raise when the backpressure controller is given invalid watermarks or smoothing factor."""
+
+    pass
+
+class MoistureLogWriterError(MqttConsumerError):
+    """Raise when the database writer thread has stopped, so received messages can no longer be written."""
+
+    pass
@@ -11,11 +11,26 @@ class Settings(BaseSettings):
     POSTGRES_SUPER_PASSWORD: SecretStr
     POSTGRES_DB: str
 
+    # Archive settings
+    ARCHIVE_DIRECTORY: str = "/app/archive" # Mounted as a volume, archived rows are deleted from Postgres
+
     # MQTT settings
     MQTT_BROKER_HOST: str
     MQTT_USERNAME: str
     MQTT_PASSWORD: SecretStr
     MQTT_PORT: int = 1883
 
+    # MQTT flow control settings
+    MQTT_RECEIVE_MAXIMUM: int = 20 # Unacknowledged QoS>0 messages the broker may send at once
+    MQTT_SESSION_EXPIRY_INTERVAL: int = 0xFFFFFFFF # Session never expires
+
+    # Backpressure settings. The high watermark must not exceed MQTT_RECEIVE_MAXIMUM.
+    # QoS 0 messages, as published by mosquitto-producer, are not limited by Receive Maximum nor queued
+    # durably by the broker. Paused reads only leave them in the socket buffers and broker queue.
+    BACKPRESSURE_HIGH_WATERMARK: int = 16
+    BACKPRESSURE_LOW_WATERMARK: int = 4
+    BACKPRESSURE_MAX_COMMIT_LATENCY_SECONDS: float = 0.5
+    BACKPRESSURE_MAX_PAUSE_SECONDS: float = 15.0
+
 # pyrefly: ignore[missing-argument]
 settings: Settings = Settings()
@@ -1,7 +1,7 @@
 from datetime import datetime, timezone
 from typing import Any, Literal, Tuple
 
-from sqlalchemy import Boolean, CheckConstraint, DateTime, ForeignKey, Integer, String
+from sqlalchemy import Boolean, CheckConstraint, DateTime, ForeignKey, Integer, String, UniqueConstraint
 from sqlalchemy.orm import Mapped, declarative_base, mapped_column
 
 from mosquitto_consumer.config.enums import TableNames
@@ -58,6 +58,36 @@ class PlantMoistureLog(Base):
         ),
     )
 
+class PlantMoistureLogArchive(Base):
+    """Model for plants_moisture_log_archives table.
+
+    Manifest of plants_moisture_log rows that have been moved to archive files. Each record covers the
+        half-open range [range_start, range_end) for a single plant.
+    """
+
+    __tablename__: Literal[TableNames.PLANTS_MOISTURE_LOG_ARCHIVES] = TableNames.PLANTS_MOISTURE_LOG_ARCHIVES
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    plant_id: Mapped[int] = mapped_column(Integer, ForeignKey('plants.id'), nullable=False, index=True)
+    range_start: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    range_end: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    file_path: Mapped[str] = mapped_column(String, unique=True, nullable=False) # Relative to ARCHIVE_DIRECTORY
+    row_count: Mapped[int] = mapped_column(Integer, nullable=False)
+    sha256: Mapped[str] = mapped_column(String(64), nullable=False)
+    archived_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(timezone.utc)
+    )
+
+    __table_args__: Tuple[UniqueConstraint, CheckConstraint] = (
+        UniqueConstraint("plant_id", "range_start", name="uq_plant_id_range_start"),
+        CheckConstraint(
+            "range_end > range_start",
+            name="check_range_end_after_start"
+        ),
+    )
+
 class RecommendedPlantMoisture(Base):
     """Model for plant_moisture_recommended_percentage table."""
 
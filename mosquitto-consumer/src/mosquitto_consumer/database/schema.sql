@@ -27,6 +27,23 @@ CREATE TABLE IF NOT EXISTS plants_moisture_log (
 CREATE INDEX IF NOT EXISTS idx_plants_moisture_logs_plant_id
     ON plants_moisture_log(plant_id);
 
+CREATE TABLE IF NOT EXISTS plants_moisture_log_archives (
+    id INT PRIMARY KEY GENERATED ALWAYS AS IDENTITY,
+    plant_id INT NOT NULL,
+    range_start TIMESTAMP WITH TIME ZONE NOT NULL,
+    range_end TIMESTAMP WITH TIME ZONE NOT NULL,
+    file_path TEXT NOT NULL UNIQUE,
+    row_count INT NOT NULL,
+    sha256 VARCHAR(64) NOT NULL,
+    archived_at TIMESTAMP WITH TIME ZONE NOT NULL
+
+    CONSTRAINT uq_plant_id_range_start UNIQUE (plant_id, range_start),
+    CONSTRAINT check_range_end_after_start CHECK (range_end > range_start)
+);
+
+CREATE INDEX IF NOT EXISTS idx_plants_moisture_log_archives_plant_id
+    ON plants_moisture_log_archives(plant_id);
+
 -- Create foreign keys if they do not exist
 
 CREATE OR REPLACE FUNCTION add_foreign_key_if_not_exists (
@@ -63,3 +80,12 @@ SELECT
         p_referenced_table=>'plants',
         p_referenced_column=>'id'
     );
+
+SELECT
+    add_foreign_key_if_not_exists(
+        p_table_name=>'plants_moisture_log_archives',
+        p_constraint_name=>'fk_plants_moisture_log_archives_plant_id',
+        p_column_name=>'plant_id',
+        p_referenced_table=>'plants',
+        p_referenced_column=>'id'
+    );
@@ -1,22 +1,55 @@
 import json
+import select
+import time
 from datetime import datetime
-from typing import Any, Dict, List, Sequence
+from queue import Queue
+from threading import Thread
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence
 
 import paho.mqtt.client as mqtt
 from paho.mqtt.client import Client, ConnectFlags, MQTTMessage, Properties, ReasonCode
+from paho.mqtt.packettypes import PacketTypes
 from sqlalchemy import RowMapping, exc
 
 from mosquitto_consumer.config.enums import MosquittoSubscribeMethod
-from mosquitto_consumer.config.exceptions import MqttBrokerConnectionError, SqlClientError
+from mosquitto_consumer.config.exceptions import MoistureLogWriterError, MqttBrokerConnectionError, SqlClientError
 from mosquitto_consumer.config.logs import logger
 from mosquitto_consumer.config.settings import settings
 from mosquitto_consumer.database.models import PlantMoistureLog
 from mosquitto_consumer.database.sql_client import sql_client
+from mosquitto_consumer.utils.backpressure import BackpressureController
 from mosquitto_consumer.utils.plants_utils import retrieve_plant_topics
 
+
+class PendingMessage(NamedTuple):
+    """A received message awaiting its database write and acknowledgement."""
+
+    connection_generation: int
+    mid: int
+    qos: int
+    moisture_log_entry: Optional[PlantMoistureLog]
+
 MQTT_CLIENT_NAME = 'plant-telemetry-moisture'
 PLANT_TOPICS: Sequence[RowMapping] | List = retrieve_plant_topics() or []
 TOPIC_TO_ID_MAPPING: Dict[str, int] = {plant["topic"]: plant["id"] for plant in PLANT_TOPICS}
+MQTT_KEEPALIVE_SECONDS = 60
+MQTT_RECONNECT_MIN_DELAY_SECONDS = 1
+MQTT_RECONNECT_MAX_DELAY_SECONDS = 120
+NETWORK_LOOP_TIMEOUT_SECONDS = 0.1
+DATABASE_RETRY_MIN_DELAY_SECONDS = 1
+DATABASE_RETRY_MAX_DELAY_SECONDS = 60
+
+# Messages flow from the network loop to the database writer thread and back again to be acknowledged.
+# The paho client is only ever called from the network loop thread.
+WRITE_QUEUE: Queue[PendingMessage] = Queue()
+ACK_QUEUE: Queue[PendingMessage] = Queue()
+BACKPRESSURE: BackpressureController = BackpressureController(
+    high_watermark=settings.BACKPRESSURE_HIGH_WATERMARK,
+    low_watermark=settings.BACKPRESSURE_LOW_WATERMARK,
+    max_commit_latency=settings.BACKPRESSURE_MAX_COMMIT_LATENCY_SECONDS,
+    max_pause=settings.BACKPRESSURE_MAX_PAUSE_SECONDS,
+    receive_maximum=settings.MQTT_RECEIVE_MAXIMUM
+)
 
 def on_connect(  # noqa: D417
     client: mqtt.Client,
@@ -33,6 +66,10 @@ def on_connect(  # noqa: D417
     """
     if reason_code == 0:
         logger.info("Successfully connected to MQTT Broker...")
+        if not flags.session_present:
+            # Message ids from a previous session must not be acknowledged on a new one. A resumed
+            # session still expects acknowledgements for messages received before the reconnect.
+            userdata["connection_generation"] += 1
         client.subscribe("plant-monitoring/#", MosquittoSubscribeMethod.EXACTLY_ONCE.value)
         logger.info("Subscribed to topics suffixed with 'plant-monitoring/'")
         logger.info("Add plants and topics via command line with: consu add")
@@ -51,6 +88,25 @@ def on_message(  # noqa: D417
     Args:
         All arguments are paho-mqtt specific.
 
+    """
+    WRITE_QUEUE.put(
+        PendingMessage(
+            connection_generation=userdata["connection_generation"],
+            mid=msg.mid,
+            qos=msg.qos,
+            moisture_log_entry=build_moisture_log_entry(msg)
+        )
+    )
+
+def build_moisture_log_entry(msg: MQTTMessage) -> Optional[PlantMoistureLog]:
+    """Build a PlantMoistureLog model object from a received message.
+
+    Args:
+        msg (MQTTMessage): Message received from the MQTT broker.
+
+    Returns:
+        Optional[PlantMoistureLog]: Model object to be inserted, or None if the message cannot be processed.
+
     """
     topic: str = msg.topic
     payload: str = msg.payload.decode("utf-8")
@@ -60,7 +116,7 @@ def on_message(  # noqa: D417
         logger.warning(f"Received message on an un-mapped topic: {topic}. Ignoring.")
         logger.warning("If a plant was added while this script is running, restart the container.")
         logger.info("Add plants and topics via command line with: consu add")
-        return
+        return None
 
     plant_id: int = TOPIC_TO_ID_MAPPING[topic]
 
@@ -70,10 +126,10 @@ def on_message(  # noqa: D417
         required_keys: list[str] = ["timestamp", "adc_value", "dry_value", "wet_value", "moisture_perc"]
         if not all(key in data for key in required_keys):
             logger.error(f"Data does not contain all required keys: {required_keys}")
-            return
+            return None
     except json.JSONDecodeError:
         logger.exception(f"Error decoding JSON from topic {topic}. Payload: {payload}")
-        return
+        return None
 
     try:
         # Attempt to create PlantMoistureLog model object
@@ -88,18 +144,124 @@ def on_message(  # noqa: D417
         )
     except (ValueError, TypeError):
         logger.exception("Error processing data to model. Message may be in incorrect format.")
-        return
+        return None
+
+    return moisture_log_entry
+
+def insert_moisture_log(moisture_log_entry: PlantMoistureLog) -> bool:
+    """Insert a moisture log, recording the commit latency with the backpressure controller.
+
+    Args:
+        moisture_log_entry (PlantMoistureLog): Model object to be inserted.
+
+    Returns:
+        bool: True if the message no longer needs processing. Rows rejected by table constraints are logged
+            and dropped, as they can never be inserted. False if the insert failed and should be retried.
 
+    """
+    # Attributes are expired once the session commits and closes, so read them beforehand
+    log_description: str = f"plant_id {moisture_log_entry.plant_id} at {moisture_log_entry.created_at}"
+
+    commit_started_at: float = time.monotonic()
     try:
         with sql_client.get_session() as session, session.begin():
             session.add(moisture_log_entry)
-            logger.info(f"Successfully inserted moisture log for plant_id {plant_id} at {timestamp}")
+    except (exc.IntegrityError, exc.DataError):
+        logger.exception("Record rejected by the database. Message will be dropped.")
+        return True
     except SqlClientError:
         logger.exception("Error while adding record to database.")
-        return
+        return False
     except exc.SQLAlchemyError:
         logger.exception("Unexpected error while adding record to database.")
-        return
+        return False
+    finally:
+        BACKPRESSURE.record_commit_latency(time.monotonic() - commit_started_at)
+
+    logger.info(f"Successfully inserted moisture log for {log_description}")
+    return True
+
+def write_moisture_logs() -> None:
+    """Write queued moisture logs to the database, then hand them back to the network loop for acknowledgement.
+
+    Runs forever in a daemon thread. Failed inserts are retried with an exponential backoff and are not
+        acknowledged in the meantime, so QoS>0 messages stay queued at the broker during a database outage.
+        Messages that can never be inserted are acknowledged straight away. Any other exception stops the
+        thread, which stops the network loop rather than leaving it paused on a backlog that never drains.
+    """
+    try:
+        while True:
+            pending_message: PendingMessage = WRITE_QUEUE.get()
+            moisture_log_entry: Optional[PlantMoistureLog] = pending_message.moisture_log_entry
+
+            if moisture_log_entry is not None:
+                retry_delay: float = DATABASE_RETRY_MIN_DELAY_SECONDS
+                while not insert_moisture_log(moisture_log_entry):
+                    logger.warning(f"Retrying insert in {retry_delay}s. Message will not be acknowledged until then.")
+                    time.sleep(retry_delay)
+                    retry_delay = min(retry_delay * 2, DATABASE_RETRY_MAX_DELAY_SECONDS)
+
+            ACK_QUEUE.put(pending_message)
+    except Exception:
+        logger.exception("Unexpected error in moisture log writer. Stopping consumer.")
+        raise
+
+def send_pending_acks(client: Client) -> None:
+    """Acknowledge messages that have been processed by the database writer thread.
+
+    Args:
+        client (Client): Connected paho client.
+
+    """
+    connection_generation: int = client.user_data_get()["connection_generation"]
+    while not ACK_QUEUE.empty():
+        pending_message: PendingMessage = ACK_QUEUE.get_nowait()
+        # Unacknowledged messages from a previous session are redelivered by the broker
+        if pending_message.connection_generation == connection_generation:
+            client.ack(pending_message.mid, pending_message.qos)
+
+def run_network_loop(client: Client, writer_thread: Thread) -> None:
+    """Drive the paho network loop, pausing socket reads whenever the backpressure controller requires it.
+
+    Replaces `loop_forever()`, which cannot stop reading from the socket. Reconnects with an exponential
+        backoff if the connection to the broker is lost.
+
+    Args:
+        client (Client): Paho client that has already called `connect()`.
+        writer_thread (Thread): Thread running `write_moisture_logs()`.
+
+    Raises:
+        MoistureLogWriterError: Raise if the database writer thread has stopped.
+
+    """
+    reconnect_delay: float = MQTT_RECONNECT_MIN_DELAY_SECONDS
+    while True:
+        if not writer_thread.is_alive():
+            raise MoistureLogWriterError()
+
+        sock = client.socket()
+        if sock is None:
+            logger.warning(f"Connection to MQTT broker lost. Reconnecting in {reconnect_delay}s...")
+            time.sleep(reconnect_delay)
+            try:
+                client.reconnect()
+                reconnect_delay = MQTT_RECONNECT_MIN_DELAY_SECONDS
+            except OSError:
+                logger.exception(f"Error reconnecting to {settings.MQTT_BROKER_HOST} on port {settings.MQTT_PORT}.")
+                reconnect_delay = min(reconnect_delay * 2, MQTT_RECONNECT_MAX_DELAY_SECONDS)
+            continue
+
+        send_pending_acks(client)
+
+        read_list = [sock] if BACKPRESSURE.should_read(WRITE_QUEUE.qsize()) else []
+        write_list = [sock] if client.want_write() else []
+        readable, writable, _ = select.select(read_list, write_list, [], NETWORK_LOOP_TIMEOUT_SECONDS)
+
+        if readable:
+            client.loop_read()
+        if writable:
+            client.loop_write()
+        client.loop_misc()
 
 def main() -> None:
     """Core logic of mosquitto consumer."""
@@ -108,22 +270,38 @@ def main() -> None:
     mqtt_client: Client = mqtt.Client(
         callback_api_version=mqtt.CallbackAPIVersion.VERSION2,
         client_id = MQTT_CLIENT_NAME,
-        clean_session=False # Allow messages to be retained if the broker is up but the client is down
+        userdata={"connection_generation": 0},
+        protocol=mqtt.MQTTv5, # Required for Receive Maximum
+        manual_ack=True # Messages are acknowledged only once written to the database
     )
     mqtt_client.on_connect = on_connect # pyrefly: ignore[bad-argument-type]
     mqtt_client.on_message = on_message
 
+    connect_properties: Properties = Properties(PacketTypes.CONNECT)
+    # Limit how many unacknowledged messages the broker sends, the rest stay queued at the broker
+    connect_properties.ReceiveMaximum = settings.MQTT_RECEIVE_MAXIMUM
+    # Allow messages to be retained if the broker is up but the client is down
+    connect_properties.SessionExpiryInterval = settings.MQTT_SESSION_EXPIRY_INTERVAL
+
     try:
         mqtt_client.username_pw_set(
             username=settings.MQTT_USERNAME,
             password=settings.MQTT_PASSWORD.get_secret_value()
         )
-        mqtt_client.connect(settings.MQTT_BROKER_HOST, port=settings.MQTT_PORT, keepalive=60)
+        mqtt_client.connect(
+            settings.MQTT_BROKER_HOST,
+            port=settings.MQTT_PORT,
+            keepalive=MQTT_KEEPALIVE_SECONDS,
+            clean_start=False,
+            properties=connect_properties
+        )
     except (ConnectionRefusedError, OSError, TypeError) as exception:
         logger.exception(f"Error connecting to {settings.MQTT_BROKER_HOST} on port {settings.MQTT_PORT}.")
         raise MqttBrokerConnectionError() from exception
 
-    mqtt_client.loop_forever()
+    writer_thread: Thread = Thread(target=write_moisture_logs, name="moisture-log-writer", daemon=True)
+    writer_thread.start()
+    run_network_loop(mqtt_client, writer_thread)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,363 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, List, Sequence, Tuple
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from sqlalchemy import Delete, Row, Select, delete, func, select
+from sqlalchemy.engine import CursorResult
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from mosquitto_consumer.config.exceptions import ArchiveError, ArchiveVerificationError, SqlClientError
+from mosquitto_consumer.config.logs import logger
+from mosquitto_consumer.config.settings import settings
+from mosquitto_consumer.database.models import PlantMoistureLog, PlantMoistureLogArchive
+from mosquitto_consumer.database.sql_client import sql_client
+
+ARCHIVE_BATCH_SIZE = 10_000
+ARCHIVE_COMPRESSION = "zstd"
+MOISTURE_LOG_SCHEMA: pa.Schema = pa.schema([
+    ("id", pa.int64()),
+    ("plant_id", pa.int32()),
+    ("created_at", pa.timestamp("us", tz="UTC")),
+    ("adc_value", pa.int32()),
+    ("dry_value", pa.int32()),
+    ("wet_value", pa.int32()),
+    ("moisture_perc", pa.int32()),
+])
+MOISTURE_LOG_COLUMNS: Tuple = tuple(getattr(PlantMoistureLog, name) for name in MOISTURE_LOG_SCHEMA.names)
+
+
+def month_start(timestamp: datetime) -> datetime:
+    """Truncate a timezone aware timestamp to the start of its calendar month in UTC."""
+    return timestamp.astimezone(timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def month_ranges(start: datetime, end: datetime) -> Iterator[Tuple[datetime, datetime]]:
+    """Yield consecutive calendar month ranges from the month containing `start` up to, but excluding, `end`.
+
+    Args:
+        start (datetime): Any timestamp within the first month.
+        end (datetime): Start of the month at which to stop.
+
+    Yields:
+        Iterator[Tuple[datetime, datetime]]: Half-open [range_start, range_end) month ranges.
+
+    """
+    range_start: datetime = month_start(start)
+    while range_start < end:
+        if range_start.month == 12:
+            range_end: datetime = range_start.replace(year=range_start.year + 1, month=1)
+        else:
+            range_end = range_start.replace(month=range_start.month + 1)
+        yield range_start, range_end
+        range_start = range_end
+
+def file_sha256(path: Path) -> str:
+    """Calculate the SHA-256 hex digest of a file, reading it in chunks."""
+    digest = hashlib.sha256()
+    with path.open("rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def archive_file_path(plant_id: int, range_start: datetime) -> Path:
+    """Build the path of an archive file, relative to the archive directory."""
+    return Path(f"plant_id={plant_id}") / f"{range_start:%Y-%m}.parquet"
+
+def _range_filter(plant_id: int, range_start: datetime, range_end: datetime) -> Tuple:
+    """Build the where clause selecting a plant's moisture logs within [range_start, range_end)."""
+    return (
+        PlantMoistureLog.plant_id == plant_id,
+        PlantMoistureLog.created_at >= range_start,
+        PlantMoistureLog.created_at < range_end,
+    )
+
+def _export_range(
+    session: Session,
+    plant_id: int,
+    range_start: datetime,
+    range_end: datetime,
+    path: Path
+) -> int:
+    """Stream a plant's moisture logs within a range into a Parquet file using a server-side cursor.
+
+    Returns:
+        int: Number of rows written.
+
+    """
+    select_statement: Select = (
+        select(*MOISTURE_LOG_COLUMNS)
+        .where(*_range_filter(plant_id, range_start, range_end))
+        .order_by(PlantMoistureLog.created_at, PlantMoistureLog.id)
+        .execution_options(yield_per=ARCHIVE_BATCH_SIZE) # Streams results with a server-side cursor
+    )
+
+    exported_rows: int = 0
+    with pq.ParquetWriter(path, MOISTURE_LOG_SCHEMA, compression=ARCHIVE_COMPRESSION) as writer:
+        for partition in session.execute(select_statement).mappings().partitions():
+            writer.write_batch(pa.RecordBatch.from_pylist([dict(row) for row in partition], schema=MOISTURE_LOG_SCHEMA))
+            exported_rows += len(partition)
+
+    return exported_rows
+
+def _verify_export(path: Path, expected_rows: int, range_start: datetime, range_end: datetime) -> None:
+    """Read back an exported file and check it holds exactly the expected rows within its range.
+
+    Raises:
+        ArchiveVerificationError: Raise if the row count, id uniqueness or timestamps do not match.
+
+    """
+    table: pa.Table = pq.read_table(path, columns=["id", "created_at"])
+    if table.num_rows != expected_rows or len(table["id"].unique()) != expected_rows:
+        logger.error(f"Archive file {path} holds {table.num_rows} rows but {expected_rows} were expected.")
+        raise ArchiveVerificationError()
+
+    if expected_rows:
+        bounds = pc.min_max(table["created_at"]).as_py() # pyrefly: ignore[missing-attribute]
+        if bounds["min"] < range_start or bounds["max"] >= range_end:
+            logger.error(f"Archive file {path} holds rows outside of range {range_start} to {range_end}.")
+            raise ArchiveVerificationError()
+
+def _archive_range(
+    session: Session,
+    plant_id: int,
+    range_start: datetime,
+    range_end: datetime,
+    archive_directory: Path
+) -> int:
+    """Move a plant's moisture logs within a range into an archive file.
+
+    Rows are only deleted once the file has been verified, and in the same transaction as the manifest
+        record is created. Must be called within `session.begin()`. The caller removes the archive file
+        if the transaction is rolled back.
+
+    Returns:
+        int: Number of rows archived.
+
+    Raises:
+        ArchiveVerificationError: Raise if the exported file or the deleted rows do not match the source.
+
+    """
+    expected_rows: int = session.scalar(
+        select(func.count()).select_from(PlantMoistureLog).where(*_range_filter(plant_id, range_start, range_end))
+    ) or 0
+    if not expected_rows:
+        return 0
+
+    relative_path: Path = archive_file_path(plant_id, range_start)
+    path: Path = archive_directory / relative_path
+    temporary_path: Path = path.with_suffix(".parquet.tmp")
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    try:
+        exported_rows: int = _export_range(session, plant_id, range_start, range_end, temporary_path)
+        if exported_rows != expected_rows:
+            logger.error(f"Exported {exported_rows} rows for plant_id {plant_id} but {expected_rows} were expected.")
+            raise ArchiveVerificationError()
+        _verify_export(temporary_path, expected_rows, range_start, range_end)
+        os.replace(temporary_path, path)
+    finally:
+        temporary_path.unlink(missing_ok=True)
+
+    session.add(
+        PlantMoistureLogArchive(
+            plant_id=plant_id,
+            range_start=range_start,
+            range_end=range_end,
+            file_path=relative_path.as_posix(),
+            row_count=exported_rows,
+            sha256=file_sha256(path)
+        )
+    )
+    delete_statement: Delete = delete(PlantMoistureLog).where(*_range_filter(plant_id, range_start, range_end))
+    delete_result: CursorResult = session.execute(delete_statement) # pyrefly: ignore[bad-assignment]
+    if delete_result.rowcount != exported_rows:
+        # Rows were written to this range after it was exported, roll back rather than lose them
+        logger.error(
+            f"Deleted {delete_result.rowcount} rows for plant_id {plant_id} but {exported_rows} were archived."
+        )
+        raise ArchiveVerificationError()
+
+    return exported_rows
+
+def _discard_archive_file(
+    plant_id: int,
+    range_start: datetime,
+    archive_directory: Path,
+    commit_started: bool
+) -> None:
+    """Remove the archive file of a range whose transaction failed, unless the transaction may have committed.
+
+    A failure during COMMIT, such as a dropped connection, leaves it unknown whether the manifest record was
+        written and the rows deleted. The file is then kept if the manifest record exists or cannot be checked.
+    """
+    path: Path = archive_directory / archive_file_path(plant_id, range_start)
+    if commit_started:
+        try:
+            with sql_client.get_session() as session, session.begin():
+                archive_id: int | None = session.scalar(
+                    select(PlantMoistureLogArchive.id).where(
+                        PlantMoistureLogArchive.plant_id == plant_id,
+                        PlantMoistureLogArchive.range_start == range_start
+                    )
+                )
+        except (SqlClientError, SQLAlchemyError):
+            logger.exception(f"Could not check whether range starting {range_start} was archived. Keeping {path}.")
+            return
+        if archive_id is not None:
+            logger.error(f"Range starting {range_start} for plant_id {plant_id} was committed. Keeping {path}.")
+            return
+
+    path.unlink(missing_ok=True)
+
+def read_archive_file(path: Path, sha256: str, start: datetime, end: datetime) -> pa.Table:
+    """Read the moisture logs within [start, end) from an archive file, after checking its checksum.
+
+    Args:
+        path (Path): Path to the archive file.
+        sha256 (str): Checksum recorded in the manifest when the file was archived.
+        start (datetime): Inclusive, timezone aware start of the range.
+        end (datetime): Exclusive, timezone aware end of the range.
+
+    Raises:
+        ArchiveVerificationError: Raise if the file no longer matches the checksum in the manifest.
+
+    Returns:
+        pa.Table: Moisture logs from the file within the range.
+
+    """
+    if file_sha256(path) != sha256:
+        logger.error(f"Archive file {path} does not match the checksum recorded when it was archived.")
+        raise ArchiveVerificationError()
+
+    return pq.read_table(
+        path,
+        schema=MOISTURE_LOG_SCHEMA,
+        filters=[("created_at", ">=", start), ("created_at", "<", end)]
+    )
+
+def archive_moisture_logs(before: datetime, archive_directory: Path | None = None) -> int:
+    """Archive all moisture logs in closed calendar months before a cutoff to Parquet files.
+
+    Each plant and month is archived in its own transaction, so a failure leaves earlier months archived
+        and the failed month untouched in the database.
+
+    Args:
+        before (datetime): Cutoff. Only months ending on or before the start of this month are archived.
+        archive_directory (Path | None, optional): Where archive files are written. Defaults to ARCHIVE_DIRECTORY.
+
+    Raises:
+        ArchiveError: Raise if a range could not be archived.
+
+    Returns:
+        int: Number of ranges archived.
+
+    """
+    archive_directory = archive_directory or Path(settings.ARCHIVE_DIRECTORY)
+    cutoff: datetime = month_start(before)
+    sql_client.create_schema()
+
+    try:
+        with sql_client.get_session() as session, session.begin():
+            oldest_logs: Sequence[Row[Tuple[int, datetime]]] = session.execute(
+                select(PlantMoistureLog.plant_id, func.min(PlantMoistureLog.created_at))
+                .where(PlantMoistureLog.created_at < cutoff)
+                .group_by(PlantMoistureLog.plant_id)
+            ).all()
+            archived_ranges: set[Tuple[int, datetime]] = {
+                (archived_plant_id, range_start)
+                for archived_plant_id, range_start in session.execute(
+                    select(PlantMoistureLogArchive.plant_id, PlantMoistureLogArchive.range_start)
+                )
+            }
+    except (SqlClientError, SQLAlchemyError) as exception:
+        logger.exception("Error while retrieving moisture log ranges to archive.")
+        raise ArchiveError() from exception
+
+    archived_range_count: int = 0
+    for plant_id, oldest_log_at in oldest_logs:
+        for range_start, range_end in month_ranges(oldest_log_at, cutoff):
+            if (plant_id, range_start) in archived_ranges:
+                logger.warning(
+                    f"Range starting {range_start} for plant_id {plant_id} is already archived. " \
+                    "Rows written to it since are kept in the database."
+                )
+                continue
+
+            commit_started: bool = False
+            try:
+                with sql_client.get_session() as session, session.begin():
+                    archived_rows: int = _archive_range(session, plant_id, range_start, range_end, archive_directory)
+                    # Any exception from here on is raised by COMMIT
+                    commit_started = True
+            except ArchiveError:
+                _discard_archive_file(plant_id, range_start, archive_directory, commit_started)
+                raise
+            except (SqlClientError, SQLAlchemyError, OSError, pa.ArrowException) as exception:
+                _discard_archive_file(plant_id, range_start, archive_directory, commit_started)
+                logger.exception(f"Error while archiving range starting {range_start} for plant_id {plant_id}.")
+                raise ArchiveError() from exception
+
+            if archived_rows:
+                archived_range_count += 1
+                logger.info(f"Archived {archived_rows} moisture logs for plant_id {plant_id} from {range_start}.")
+
+    return archived_range_count
+
+def read_moisture_logs(
+    plant_id: int,
+    start: datetime,
+    end: datetime,
+    archive_directory: Path | None = None
+) -> pa.Table:
+    """Read a plant's moisture logs within [start, end), merging archive files with rows still in the database.
+
+    Args:
+        plant_id (int): The id of the plant.
+        start (datetime): Inclusive, timezone aware start of the range.
+        end (datetime): Exclusive, timezone aware end of the range.
+        archive_directory (Path | None, optional): Where archive files are read from. Defaults to ARCHIVE_DIRECTORY.
+
+    Raises:
+        ArchiveError: Raise if the database or an archive file could not be read.
+        ArchiveVerificationError: Raise if an archive file does not match its checksum.
+
+    Returns:
+        pa.Table: Moisture logs ordered by created_at, with the same columns as plants_moisture_log.
+
+    """
+    archive_directory = archive_directory or Path(settings.ARCHIVE_DIRECTORY)
+    tables: List[pa.Table] = []
+
+    try:
+        with sql_client.get_session() as session, session.begin():
+            archive_files: Sequence[Row[Tuple[str, str]]] = session.execute(
+                select(PlantMoistureLogArchive.file_path, PlantMoistureLogArchive.sha256)
+                .where(
+                    PlantMoistureLogArchive.plant_id == plant_id,
+                    PlantMoistureLogArchive.range_start < end,
+                    PlantMoistureLogArchive.range_end > start
+                )
+                .order_by(PlantMoistureLogArchive.range_start)
+            ).all()
+            live_rows: Sequence = session.execute(
+                select(*MOISTURE_LOG_COLUMNS)
+                .where(*_range_filter(plant_id, start, end))
+                .order_by(PlantMoistureLog.created_at, PlantMoistureLog.id)
+            ).mappings().all()
+
+        for archive_path, sha256 in archive_files:
+            tables.append(read_archive_file(archive_directory / archive_path, sha256, start, end))
+        tables.append(pa.Table.from_pylist([dict(row) for row in live_rows], schema=MOISTURE_LOG_SCHEMA))
+    except (SqlClientError, SQLAlchemyError) as exception:
+        logger.exception(f"Error while reading moisture logs for plant_id {plant_id}.")
+        raise ArchiveError() from exception
+    except (OSError, pa.ArrowException) as exception:
+        logger.exception(f"Error while reading archived moisture logs for plant_id {plant_id}.")
+        raise ArchiveError() from exception
+
+    return pa.concat_tables(tables).sort_by([("created_at", "ascending"), ("id", "ascending")])
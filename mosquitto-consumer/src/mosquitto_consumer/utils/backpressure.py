@@ -0,0 +1,145 @@
+import time
+from threading import Lock
+from typing import Optional
+
+from mosquitto_consumer.config.exceptions import BackpressureConfigurationError
+from mosquitto_consumer.config.logs import logger
+
+
+class BackpressureController:
+    """Decide whether the consumer should read from the MQTT socket.
+
+    Reading is paused when the internal write backlog reaches the high watermark, or when
+        database commits are slow while a backlog is building. Reading resumes once the backlog
+        drains to the low watermark. While reads are paused, unacknowledged QoS>0 messages stay queued
+        at the broker rather than in consumer memory.
+
+    As messages are only acknowledged once written, the broker never has more than Receive Maximum
+        QoS>0 messages outstanding, so the high watermark must not exceed it. QoS 0 messages bypass
+        Receive Maximum and acknowledgements, and are not queued durably by the broker. While reads are
+        paused they build up in the socket buffers and may be dropped by the broker. mosquitto-producer
+        publishes with PubSubClient, which only supports QoS 0, so for its telemetry pausing reads bounds
+        consumer memory but does not queue load durably.
+
+    Usage:
+        controller = BackpressureController(high_watermark=16, low_watermark=4, receive_maximum=20)
+        controller.record_commit_latency(0.05)  # From the database writer thread
+        if controller.should_read(write_queue.qsize()):  # From the network loop thread
+            mqtt_client.loop_read()
+    """
+
+    def __init__(
+        self,
+        high_watermark: int,
+        low_watermark: int,
+        max_commit_latency: float = 0.5,
+        max_pause: float = 15.0,
+        smoothing: float = 0.2,
+        receive_maximum: Optional[int] = None
+    ) -> None:
+        """Instantiate BackpressureController class.
+
+        Args:
+            high_watermark (int): Backlog size at which socket reads are paused.
+            low_watermark (int): Backlog size at which socket reads are resumed.
+            max_commit_latency (float, optional): Smoothed commit latency in seconds above which reads
+                are paused while the backlog is above the low watermark. Defaults to 0.5.
+            max_pause (float, optional): Seconds after which a single read is forced while paused, so that
+                keepalive responses are still processed. Must be lower than the MQTT keepalive. Defaults to 15.0.
+            smoothing (float, optional): Weight given to the latest sample in the exponentially weighted
+                moving average of commit latency. Defaults to 0.2.
+            receive_maximum (Optional[int], optional): MQTT v5 Receive Maximum sent to the broker. If given,
+                the high watermark must not exceed it. Defaults to None.
+
+        Raises:
+            BackpressureConfigurationError: Raise if the watermarks or smoothing factor are out of range, or if the
+                high watermark exceeds Receive Maximum.
+
+        """
+        if not 0 <= low_watermark < high_watermark:
+            logger.error(
+                "Backpressure low watermark %s must be non-negative and lower than the high watermark %s.",
+                low_watermark,
+                high_watermark
+            )
+            raise BackpressureConfigurationError()
+        if receive_maximum is not None and high_watermark > receive_maximum:
+            logger.error(
+                "Backpressure high watermark %s must not exceed MQTT Receive Maximum %s, or it can never be reached.",
+                high_watermark,
+                receive_maximum
+            )
+            raise BackpressureConfigurationError()
+        if not 0 < smoothing <= 1:
+            logger.error("Backpressure smoothing factor %s must be greater than 0 and at most 1.", smoothing)
+            raise BackpressureConfigurationError()
+
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.max_commit_latency = max_commit_latency
+        self.max_pause = max_pause
+        self.smoothing = smoothing
+
+        self._lock: Lock = Lock()
+        self._commit_latency: float = 0.0
+        self._paused_since: Optional[float] = None
+
+    @property
+    def commit_latency(self) -> float:
+        """Smoothed database commit latency in seconds."""
+        with self._lock:
+            return self._commit_latency
+
+    def record_commit_latency(self, seconds: float) -> None:
+        """Fold a database commit duration into the smoothed commit latency.
+
+        Args:
+            seconds (float): Time taken by a single database commit.
+
+        """
+        with self._lock:
+            self._commit_latency += self.smoothing * (seconds - self._commit_latency)
+
+    def should_read(self, backlog: int) -> bool:
+        """Determine whether the network loop should read from the socket.
+
+        Args:
+            backlog (int): Number of received messages not yet written to the database.
+
+        Returns:
+            bool: True if the socket should be read on this iteration of the network loop.
+
+        """
+        now: float = time.monotonic()
+        commit_latency: float = self.commit_latency
+
+        if self._paused_since is None:
+            if backlog >= self.high_watermark or (
+                backlog > self.low_watermark and commit_latency > self.max_commit_latency
+            ):
+                self._paused_since = now
+                logger.warning(
+                    "Pausing MQTT reads. Backlog: %s messages, commit latency: %.3fs.",
+                    backlog,
+                    commit_latency
+                )
+                return False
+            return True
+
+        if backlog <= self.low_watermark:
+            logger.info(
+                "Resuming MQTT reads after %.1fs. Backlog: %s messages, commit latency: %.3fs.",
+                now - self._paused_since,
+                backlog,
+                commit_latency
+            )
+            self._paused_since = None
+            return True
+
+        if now - self._paused_since >= self.max_pause:
+            # Allow a single read to process keepalive responses, then restart the pause
+            logger.debug("MQTT reads paused for %.1fs. Forcing a single read.", now - self._paused_since)
+            self._paused_since = now
+            return True
+
+        return False
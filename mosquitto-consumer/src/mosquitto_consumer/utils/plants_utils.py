@@ -9,6 +9,10 @@ from mosquitto_consumer.database.models import Plant
 from mosquitto_consumer.database.sql_client import sql_client
 
 
+def build_topic(topic_plant_location: str, topic_plant_name: str) -> str:
+    """Build the telemetry topic a plant's producer publishes to."""
+    return f"plant-monitoring/{topic_plant_location}/{topic_plant_name}/telemetry"
+
 def retrieve_plant_topics() -> Sequence[RowMapping] | None :
     """Retrieve all the existing topics to subscribe to."""
     try:
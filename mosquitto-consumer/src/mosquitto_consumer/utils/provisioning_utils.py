@@ -0,0 +1,344 @@
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Annotated, Any, Dict, List, NamedTuple, Optional, Self, Sequence
+
+import yaml
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, model_validator
+from sqlalchemy import RowMapping, Select, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from mosquitto_consumer.config.enums import ProvisioningAction
+from mosquitto_consumer.config.exceptions import (
+    ManifestError,
+    PlantNameConflictError,
+    SqlClientError,
+    StalePlanError,
+)
+from mosquitto_consumer.config.logs import logger
+from mosquitto_consumer.database.models import Plant, RecommendedPlantMoisture
+from mosquitto_consumer.database.sql_client import sql_client
+from mosquitto_consumer.utils.plants_utils import build_topic
+
+TOPIC_LEVEL_PATTERN = r"^[^/#+]+$" # A single MQTT topic level without wildcards
+MoisturePercentage = Annotated[int, Field(ge=0, le=100)]
+
+
+class PlantManifestEntry(BaseModel):
+    """A plant declared in a provisioning manifest."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    plant_name: str = Field(min_length=1)
+    topic_plant_location: str = Field(pattern=TOPIC_LEVEL_PATTERN)
+    topic_plant_name: str = Field(pattern=TOPIC_LEVEL_PATTERN)
+    is_deprecated: bool = False
+    min_moisture_perc: Optional[MoisturePercentage] = None
+    max_moisture_perc: Optional[MoisturePercentage] = None
+
+    @property
+    def topic(self) -> str:
+        """Telemetry topic of the plant."""
+        return build_topic(self.topic_plant_location, self.topic_plant_name)
+
+    @model_validator(mode="after")
+    def check_moisture_range(self) -> Self:
+        """Check the recommended moisture range is either complete and valid, or omitted."""
+        min_moisture_perc, max_moisture_perc = self.min_moisture_perc, self.max_moisture_perc
+        if (min_moisture_perc is None) != (max_moisture_perc is None):
+            raise ValueError("min_moisture_perc and max_moisture_perc must be set together.")  # noqa: TRY003
+        if min_moisture_perc is not None and max_moisture_perc is not None and max_moisture_perc <= min_moisture_perc:
+            raise ValueError("max_moisture_perc must be greater than min_moisture_perc.")  # noqa: TRY003
+        return self
+
+class PlantManifest(BaseModel):
+    """Declarative list of plants and their recommended moisture ranges."""
+
+    model_config = ConfigDict(extra="forbid")
+
+    plants: List[PlantManifestEntry]
+
+    @model_validator(mode="after")
+    def check_unique_plants(self) -> Self:
+        """Check no two plants share a name or topic."""
+        for attribute in ("plant_name", "topic"):
+            values: List[str] = [getattr(plant, attribute) for plant in self.plants]
+            duplicates: set[str] = {value for value in values if values.count(value) > 1}
+            if duplicates:
+                raise ValueError(f"Duplicate {attribute} in manifest: {', '.join(sorted(duplicates))}.")  # noqa: TRY003
+        return self
+
+class PlannedChange(NamedTuple):
+    """A single change to be made by a provisioning plan, for display."""
+
+    action: ProvisioningAction
+    topic: str
+    detail: str
+
+@dataclass
+class ProvisioningPlan:
+    """Changes required to bring the plants tables in line with a manifest."""
+
+    changes: List[PlannedChange] = field(default_factory=list)
+    # Rows to insert into plants
+    plant_inserts: List[Dict[str, Any]] = field(default_factory=list)
+    # Rows to update in plants, keyed on id
+    plant_updates: List[Dict[str, Any]] = field(default_factory=list)
+    # Rows to upsert into recommended_plant_moisture, keyed on topic as new plants have no id yet
+    moisture_rows: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    # Ids of plants that already exist, keyed on their topic once the plan is applied
+    plant_ids: Dict[str, int] = field(default_factory=dict)
+    # Ids of plants whose name or topic changes, which may collide with another plant mid-update
+    renamed_ids: List[int] = field(default_factory=list)
+
+def load_manifest(path: Path) -> PlantManifest:
+    """Load and validate a provisioning manifest from a YAML file.
+
+    Args:
+        path (Path): Path to the manifest file.
+
+    Raises:
+        ManifestError: Raise if the file cannot be read, is not valid YAML or does not match the manifest format.
+
+    Returns:
+        PlantManifest: The validated manifest.
+
+    """
+    try:
+        with path.open() as file:
+            return PlantManifest.model_validate(yaml.safe_load(file))
+    except (OSError, yaml.YAMLError, ValidationError) as exception:
+        logger.error(f"Invalid provisioning manifest {path}: {exception}")
+        raise ManifestError() from exception
+
+def _select_existing_plants(session: Session, lock: bool = False) -> Sequence[RowMapping]:
+    """Select every plant with its recommended moisture range in a single query.
+
+    Args:
+        session (Session): Session within a transaction.
+        lock (bool, optional): Lock the selected plants rows until the end of the transaction. Defaults to False.
+
+    Returns:
+        Sequence[RowMapping]: One row per plant.
+
+    """
+    select_statement: Select = (
+        select(
+            Plant.id,
+            Plant.plant_name,
+            Plant.topic,
+            Plant.is_deprecated,
+            Plant.last_deprecated_at,
+            RecommendedPlantMoisture.min_moisture_perc,
+            RecommendedPlantMoisture.max_moisture_perc,
+        )
+        .outerjoin(RecommendedPlantMoisture, RecommendedPlantMoisture.plant_id == Plant.id)
+        .order_by(Plant.id)
+    )
+    if lock:
+        select_statement = select_statement.with_for_update(of=Plant)
+    return session.execute(select_statement).mappings().all()
+
+def _build_plan(
+    manifest: PlantManifest,
+    existing_plants: Sequence[RowMapping],
+    prune: bool
+) -> ProvisioningPlan:
+    """Diff a manifest against the existing plants.
+
+    Manifest plants are matched to existing plants on topic. A manifest plant with a new topic is matched
+        on name instead, and moved, if the plant with that name is not in the manifest under its current topic.
+
+    Raises:
+        PlantNameConflictError: Raise if a manifest plant would take the name of a plant left out of the manifest.
+
+    """
+    now: datetime = datetime.now(timezone.utc)
+    manifest_topics: set[str] = {entry.topic for entry in manifest.plants}
+    topic_to_plant: Dict[str, RowMapping] = {plant["topic"]: plant for plant in existing_plants}
+    name_to_plant: Dict[str, RowMapping] = {plant["plant_name"]: plant for plant in existing_plants}
+    matched_ids: set[int] = set()
+    plan: ProvisioningPlan = ProvisioningPlan()
+
+    for entry in manifest.plants:
+        current: Optional[RowMapping] = topic_to_plant.get(entry.topic)
+        if current is None:
+            same_name_plant: Optional[RowMapping] = name_to_plant.get(entry.plant_name)
+            if same_name_plant is not None and same_name_plant["topic"] not in manifest_topics:
+                current = same_name_plant
+
+        plant_row: Dict[str, Any] = {
+            "plant_name": entry.plant_name,
+            "topic": entry.topic,
+            "is_deprecated": entry.is_deprecated,
+            "last_deprecated_at": now if entry.is_deprecated else None,
+        }
+
+        if current is None:
+            plan.changes.append(PlannedChange(ProvisioningAction.CREATE, entry.topic, entry.plant_name))
+            plan.plant_inserts.append(plant_row)
+        else:
+            matched_ids.add(current["id"])
+            plan.plant_ids[entry.topic] = current["id"]
+            plant_changes: List[PlannedChange] = []
+            if current["topic"] != entry.topic:
+                plant_changes.append(
+                    PlannedChange(ProvisioningAction.MOVE, entry.topic, f"{entry.plant_name} from {current['topic']}")
+                )
+            if current["plant_name"] != entry.plant_name:
+                plant_changes.append(
+                    PlannedChange(
+                        ProvisioningAction.RENAME,
+                        entry.topic,
+                        f"{current['plant_name']} -> {entry.plant_name}"
+                    )
+                )
+            if current["is_deprecated"] != entry.is_deprecated:
+                action: ProvisioningAction = (
+                    ProvisioningAction.DEPRECATE if entry.is_deprecated else ProvisioningAction.ACTIVATE
+                )
+                plant_changes.append(PlannedChange(action, entry.topic, entry.plant_name))
+            if not (entry.is_deprecated and not current["is_deprecated"]):
+                # Only a newly deprecated plant gets a new deprecation time
+                plant_row["last_deprecated_at"] = current["last_deprecated_at"]
+
+            if current["topic"] != entry.topic or current["plant_name"] != entry.plant_name:
+                plan.renamed_ids.append(current["id"])
+            if plant_changes:
+                plan.changes.extend(plant_changes)
+                plan.plant_updates.append({"id": current["id"], **plant_row})
+
+        if entry.min_moisture_perc is not None and (
+            current is None
+            or (current["min_moisture_perc"], current["max_moisture_perc"])
+            != (entry.min_moisture_perc, entry.max_moisture_perc)
+        ):
+            plan.changes.append(
+                PlannedChange(
+                    ProvisioningAction.SET_RANGE,
+                    entry.topic,
+                    f"{entry.min_moisture_perc}-{entry.max_moisture_perc}%"
+                )
+            )
+            plan.moisture_rows[entry.topic] = {
+                "min_moisture_perc": entry.min_moisture_perc,
+                "max_moisture_perc": entry.max_moisture_perc,
+            }
+
+    unmatched_plants: List[RowMapping] = [plant for plant in existing_plants if plant["id"] not in matched_ids]
+
+    # Plants left out of the manifest keep their names, even when pruned
+    unmatched_names: set[str] = {plant["plant_name"] for plant in unmatched_plants}
+    conflicting_names: List[str] = [
+        entry.plant_name for entry in manifest.plants if entry.plant_name in unmatched_names
+    ]
+    if conflicting_names:
+        logger.error(f"Plant names already used by plants that are not in the manifest: {conflicting_names}")
+        raise PlantNameConflictError(conflicting_names)
+
+    if prune:
+        for plant in unmatched_plants:
+            if not plant["is_deprecated"]:
+                plan.changes.append(PlannedChange(ProvisioningAction.DEPRECATE, plant["topic"], plant["plant_name"]))
+                plan.plant_updates.append({
+                    "id": plant["id"],
+                    "plant_name": plant["plant_name"],
+                    "topic": plant["topic"],
+                    "is_deprecated": True,
+                    "last_deprecated_at": now,
+                })
+
+    return plan
+
+def plan_provisioning(manifest: PlantManifest, prune: bool = False) -> ProvisioningPlan:
+    """Diff a manifest against the plants and recommended_plant_moisture tables in a single query.
+
+    Args:
+        manifest (PlantManifest): The desired state of the plants.
+        prune (bool, optional): Deprecate active plants that are not in the manifest. Defaults to False.
+
+    Raises:
+        PlantNameConflictError: Raise if a manifest plant would take the name of a plant left out of the manifest.
+
+    Returns:
+        ProvisioningPlan: The changes needed. Empty if the tables already match the manifest.
+
+    """
+    try:
+        with sql_client.get_session() as session, session.begin():
+            existing_plants: Sequence[RowMapping] = _select_existing_plants(session)
+    except SqlClientError:
+        logger.exception("Error while retrieving plants for provisioning.")
+        raise
+    except SQLAlchemyError:
+        logger.exception("Unexpected error while retrieving plants for provisioning.")
+        raise
+
+    return _build_plan(manifest, existing_plants, prune)
+
+def apply_provisioning(manifest: PlantManifest, confirmed_plan: ProvisioningPlan, prune: bool = False) -> None:
+    """Apply a provisioning plan in a single transaction using batched statements.
+
+    The plants rows are re-read with `SELECT ... FOR UPDATE` and the plan rebuilt inside the transaction,
+        so that changes made since the plan was confirmed are never overwritten.
+
+    Args:
+        manifest (PlantManifest): The manifest the plan was built from.
+        confirmed_plan (ProvisioningPlan): Plan returned by `plan_provisioning()` and confirmed by the user.
+        prune (bool, optional): Deprecate active plants that are not in the manifest. Defaults to False.
+
+    Raises:
+        StalePlanError: Raise if the plants tables changed since the plan was built.
+
+    """
+    try:
+        with sql_client.get_session() as session, session.begin():
+            plan: ProvisioningPlan = _build_plan(manifest, _select_existing_plants(session, lock=True), prune)
+            if plan.changes != confirmed_plan.changes:
+                logger.error("Plants changed since the provisioning plan was built. No changes applied.")
+                raise StalePlanError()
+
+            if plan.renamed_ids:
+                # Unique constraints are checked row by row, so free up names and topics before swapping them
+                session.execute(
+                    update(Plant),
+                    [
+                        {
+                            "id": plant_id,
+                            "plant_name": f"__provisioning__{plant_id}",
+                            "topic": f"plant-monitoring/__provisioning__/{plant_id}/telemetry",
+                        }
+                        for plant_id in plan.renamed_ids
+                    ]
+                )
+            if plan.plant_updates:
+                session.execute(update(Plant), plan.plant_updates)
+
+            plant_ids: Dict[str, int] = dict(plan.plant_ids)
+            if plan.plant_inserts:
+                plant_insert = insert(Plant).values(plan.plant_inserts).returning(Plant.topic, Plant.id)
+                plant_ids.update(session.execute(plant_insert).tuples().all())
+
+            if plan.moisture_rows:
+                now: datetime = datetime.now(timezone.utc)
+                moisture_upsert = insert(RecommendedPlantMoisture).values([
+                    {"plant_id": plant_ids[topic], "last_updated_at": now, **moisture_row}
+                    for topic, moisture_row in plan.moisture_rows.items()
+                ])
+                moisture_upsert = moisture_upsert.on_conflict_do_update(
+                    index_elements=[RecommendedPlantMoisture.plant_id],
+                    set_={
+                        "min_moisture_perc": moisture_upsert.excluded.min_moisture_perc,
+                        "max_moisture_perc": moisture_upsert.excluded.max_moisture_perc,
+                        "last_updated_at": moisture_upsert.excluded.last_updated_at,
+                    }
+                )
+                session.execute(moisture_upsert)
+    except SqlClientError:
+        logger.exception("Error while applying provisioning plan.")
+        raise
+    except SQLAlchemyError:
+        logger.exception("Unexpected error while applying provisioning plan.")
+        raise
@@ -0,0 +1,14 @@
+import os
+
+# Settings are read from the environment on import, so provide placeholders before any module is imported.
+# No test connects to Postgres or the MQTT broker.
+for variable in (
+    "POSTGRES_DB_HOST",
+    "POSTGRES_SUPER_USER",
+    "POSTGRES_SUPER_PASSWORD",
+    "POSTGRES_DB",
+    "MQTT_BROKER_HOST",
+    "MQTT_USERNAME",
+    "MQTT_PASSWORD",
+):
+    os.environ.setdefault(variable, "test")
@@ -0,0 +1,235 @@
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Optional
+from unittest.mock import MagicMock
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from mosquitto_consumer.config.exceptions import ArchiveError, ArchiveVerificationError
+from mosquitto_consumer.database.models import PlantMoistureLogArchive
+from mosquitto_consumer.utils import archive_utils
+from mosquitto_consumer.utils.archive_utils import (
+    MOISTURE_LOG_SCHEMA,
+    _archive_range,
+    _verify_export,
+    archive_file_path,
+    archive_moisture_logs,
+    file_sha256,
+    month_ranges,
+    month_start,
+    read_archive_file,
+    read_moisture_logs,
+)
+
+RANGE_START: datetime = datetime(2025, 12, 1, tzinfo=timezone.utc)
+RANGE_END: datetime = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def moisture_log_row(log_id: int, created_at: datetime) -> dict[str, Any]:
+    """Build a moisture log row for plant 1, as selected from the database."""
+    return {
+        "id": log_id,
+        "plant_id": 1,
+        "created_at": created_at,
+        "adc_value": 500,
+        "dry_value": 800,
+        "wet_value": 300,
+        "moisture_perc": 60,
+    }
+
+def write_archive(path: Path, ids: list[int], created_at: list[datetime]) -> None:
+    """Write moisture logs with the given ids and timestamps to a Parquet file."""
+    rows: list[dict] = [moisture_log_row(log_id, timestamp) for log_id, timestamp in zip(ids, created_at)]
+    pq.write_table(pa.Table.from_pylist(rows, schema=MOISTURE_LOG_SCHEMA), path)
+
+def archive_session(rows: list[dict[str, Any]], expected_rows: int, deleted_rows: int) -> MagicMock:
+    """Mock a session that counts, exports and then deletes a range of moisture logs."""
+    session: MagicMock = MagicMock()
+    session.scalar.return_value = expected_rows
+    export_result: MagicMock = MagicMock()
+    export_result.mappings.return_value.partitions.return_value = [rows]
+    session.execute.side_effect = [export_result, MagicMock(rowcount=deleted_rows)]
+    return session
+
+def session_context(session: MagicMock) -> MagicMock:
+    """Mock the context manager returned by `sql_client.get_session()`."""
+    context: MagicMock = MagicMock()
+    context.__enter__.return_value = session
+    return context
+
+@pytest.fixture
+def sql_client(monkeypatch: pytest.MonkeyPatch) -> MagicMock:
+    """Replace the database client, so tests can hand out a mocked session per `get_session()` call."""
+    fake_sql_client: MagicMock = MagicMock()
+    monkeypatch.setattr(archive_utils, "sql_client", fake_sql_client)
+    return fake_sql_client
+
+def test_month_start_truncates_to_utc_month() -> None:
+    """Timestamps are truncated to the start of their calendar month in UTC."""
+    assert month_start(datetime(2026, 3, 15, 13, 45, tzinfo=timezone.utc)) == datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+def test_month_ranges_cross_year_boundary() -> None:
+    """Month ranges roll over from December into January of the next year."""
+    ranges: list[tuple[datetime, datetime]] = list(
+        month_ranges(datetime(2025, 11, 20, tzinfo=timezone.utc), datetime(2026, 2, 1, tzinfo=timezone.utc))
+    )
+
+    assert ranges == [
+        (datetime(2025, 11, 1, tzinfo=timezone.utc), datetime(2025, 12, 1, tzinfo=timezone.utc)),
+        (datetime(2025, 12, 1, tzinfo=timezone.utc), datetime(2026, 1, 1, tzinfo=timezone.utc)),
+        (datetime(2026, 1, 1, tzinfo=timezone.utc), datetime(2026, 2, 1, tzinfo=timezone.utc)),
+    ]
+
+def test_month_ranges_is_empty_when_start_is_in_end_month() -> None:
+    """No ranges are yielded for the month that is still open."""
+    assert not list(month_ranges(datetime(2026, 1, 15, tzinfo=timezone.utc), RANGE_END))
+
+def test_verify_export_accepts_matching_file(tmp_path: Path) -> None:
+    """A file holding the expected rows within its range passes verification."""
+    path: Path = tmp_path / "2025-12.parquet"
+    write_archive(path, [1, 2], [RANGE_START, datetime(2025, 12, 31, 23, 59, tzinfo=timezone.utc)])
+
+    _verify_export(path, 2, RANGE_START, RANGE_END)
+
+@pytest.mark.parametrize(
+    ("ids", "created_at", "expected_rows"),
+    [
+        ([1, 2], [RANGE_START, RANGE_START], 3), # Missing a row
+        ([1, 1], [RANGE_START, RANGE_START], 2), # Duplicated id
+        ([1, 2], [RANGE_START, RANGE_END], 2), # Row outside of the range
+    ]
+)
+def test_verify_export_rejects_tampered_file(
+    tmp_path: Path,
+    ids: list[int],
+    created_at: list[datetime],
+    expected_rows: int
+) -> None:
+    """Files that do not hold exactly the expected rows within the range are rejected."""
+    path: Path = tmp_path / "2025-12.parquet"
+    write_archive(path, ids, created_at)
+
+    with pytest.raises(ArchiveVerificationError):
+        _verify_export(path, expected_rows, RANGE_START, RANGE_END)
+
+def test_read_archive_file_filters_to_range(tmp_path: Path) -> None:
+    """Only rows within the requested range are read from an archive file."""
+    path: Path = tmp_path / "2025-12.parquet"
+    write_archive(path, [1, 2], [RANGE_START, datetime(2025, 12, 20, tzinfo=timezone.utc)])
+
+    table: pa.Table = read_archive_file(
+        path,
+        file_sha256(path),
+        datetime(2025, 12, 10, tzinfo=timezone.utc),
+        RANGE_END
+    )
+
+    assert table["id"].to_pylist() == [2]
+
+def test_read_archive_file_rejects_checksum_mismatch(tmp_path: Path) -> None:
+    """An archive file changed since it was archived is not read."""
+    path: Path = tmp_path / "2025-12.parquet"
+    write_archive(path, [1], [RANGE_START])
+    sha256: str = file_sha256(path)
+    write_archive(path, [1, 2], [RANGE_START, RANGE_START])
+
+    with pytest.raises(ArchiveVerificationError):
+        read_archive_file(path, sha256, RANGE_START, RANGE_END)
+
+def test_archive_range_exports_then_deletes(tmp_path: Path) -> None:
+    """A verified export is recorded in the manifest before the archived rows are deleted."""
+    rows: list[dict[str, Any]] = [moisture_log_row(1, RANGE_START), moisture_log_row(2, RANGE_START)]
+    session: MagicMock = archive_session(rows, expected_rows=2, deleted_rows=2)
+
+    assert _archive_range(session, 1, RANGE_START, RANGE_END, tmp_path) == 2
+
+    path: Path = tmp_path / archive_file_path(1, RANGE_START)
+    archive: PlantMoistureLogArchive = session.add.call_args.args[0]
+    assert archive.file_path == "plant_id=1/2025-12.parquet"
+    assert (archive.row_count, archive.sha256) == (2, file_sha256(path))
+    assert session.execute.call_count == 2
+    assert not path.with_suffix(".parquet.tmp").exists()
+
+def test_archive_range_rejects_incomplete_export(tmp_path: Path) -> None:
+    """Rows are neither recorded nor deleted when fewer were exported than counted."""
+    session: MagicMock = archive_session([moisture_log_row(1, RANGE_START)], expected_rows=2, deleted_rows=2)
+
+    with pytest.raises(ArchiveVerificationError):
+        _archive_range(session, 1, RANGE_START, RANGE_END, tmp_path)
+
+    session.add.assert_not_called()
+    assert session.execute.call_count == 1
+    assert not list(tmp_path.rglob("*.parquet*"))
+
+def test_archive_range_rejects_rows_written_after_export(tmp_path: Path) -> None:
+    """The transaction is rolled back when more rows are deleted than were exported."""
+    session: MagicMock = archive_session([moisture_log_row(1, RANGE_START)], expected_rows=1, deleted_rows=2)
+
+    with pytest.raises(ArchiveVerificationError):
+        _archive_range(session, 1, RANGE_START, RANGE_END, tmp_path)
+
+def test_archive_moisture_logs_removes_file_when_rolled_back(tmp_path: Path, sql_client: MagicMock) -> None:
+    """The archive file of a range is removed when its transaction is rolled back before commit."""
+    ranges_session: MagicMock = MagicMock()
+    ranges_session.execute.side_effect = [MagicMock(all=MagicMock(return_value=[(1, RANGE_START)])), []]
+    rows: list[dict[str, Any]] = [moisture_log_row(1, RANGE_START)]
+    sql_client.get_session.side_effect = [
+        session_context(ranges_session),
+        session_context(archive_session(rows, expected_rows=1, deleted_rows=2)),
+    ]
+
+    with pytest.raises(ArchiveVerificationError):
+        archive_moisture_logs(RANGE_END, tmp_path)
+
+    assert not (tmp_path / archive_file_path(1, RANGE_START)).exists()
+
+@pytest.mark.parametrize(("archive_id", "file_kept"), [(1, True), (None, False)])
+def test_archive_moisture_logs_keeps_file_when_commit_may_have_succeeded(
+    tmp_path: Path,
+    sql_client: MagicMock,
+    archive_id: Optional[int],
+    file_kept: bool
+) -> None:
+    """A failed COMMIT only removes the archive file if the manifest record was not written."""
+    ranges_session: MagicMock = MagicMock()
+    ranges_session.execute.side_effect = [MagicMock(all=MagicMock(return_value=[(1, RANGE_START)])), []]
+    session: MagicMock = archive_session([moisture_log_row(1, RANGE_START)], expected_rows=1, deleted_rows=1)
+    session.begin.return_value.__exit__.side_effect = OperationalError("COMMIT", {}, Exception("connection lost"))
+    check_session: MagicMock = MagicMock()
+    check_session.scalar.return_value = archive_id
+    sql_client.get_session.side_effect = [
+        session_context(ranges_session),
+        session_context(session),
+        session_context(check_session),
+    ]
+
+    with pytest.raises(ArchiveError):
+        archive_moisture_logs(RANGE_END, tmp_path)
+
+    assert (tmp_path / archive_file_path(1, RANGE_START)).exists() == file_kept
+
+def test_read_moisture_logs_merges_archive_and_database(tmp_path: Path, sql_client: MagicMock) -> None:
+    """Rows from archive files and the database are filtered to the range and merged in order."""
+    path: Path = tmp_path / archive_file_path(1, RANGE_START)
+    path.parent.mkdir()
+    write_archive(path, [1, 2], [RANGE_START, datetime(2025, 12, 20, tzinfo=timezone.utc)])
+    session: MagicMock = MagicMock()
+    live_result: MagicMock = MagicMock()
+    live_result.mappings.return_value.all.return_value = [moisture_log_row(3, RANGE_END)]
+    session.execute.side_effect = [
+        MagicMock(all=MagicMock(return_value=[(archive_file_path(1, RANGE_START).as_posix(), file_sha256(path))])),
+        live_result,
+    ]
+    sql_client.get_session.return_value = session_context(session)
+
+    table: pa.Table = read_moisture_logs(
+        1,
+        datetime(2025, 12, 10, tzinfo=timezone.utc),
+        datetime(2026, 2, 1, tzinfo=timezone.utc),
+        tmp_path
+    )
+
+    assert table["id"].to_pylist() == [2, 3]
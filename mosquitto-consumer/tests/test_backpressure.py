@@ -0,0 +1,101 @@
+import pytest
+
+from mosquitto_consumer.config.exceptions import BackpressureConfigurationError
+from mosquitto_consumer.utils import backpressure
+from mosquitto_consumer.utils.backpressure import BackpressureController
+
+
+class FakeClock:
+    """Stand in for time.monotonic that only moves when told to."""
+
+    def __init__(self) -> None:
+        """Start the clock at zero."""
+        self.now: float = 0.0
+
+    def __call__(self) -> float:
+        """Return the current time."""
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> FakeClock:
+    """Replace the controller's clock."""
+    fake_clock: FakeClock = FakeClock()
+    monkeypatch.setattr(backpressure.time, "monotonic", fake_clock)
+    return fake_clock
+
+@pytest.fixture
+def controller(clock: FakeClock) -> BackpressureController:
+    """Build a controller with the default watermarks for a Receive Maximum of 20."""
+    return BackpressureController(
+        high_watermark=16,
+        low_watermark=4,
+        max_commit_latency=0.5,
+        max_pause=15.0,
+        receive_maximum=20
+    )
+
+def test_reads_while_backlog_below_high_watermark(controller: BackpressureController) -> None:
+    """Reads continue while the backlog is below the high watermark and commits are fast."""
+    assert controller.should_read(0)
+    assert controller.should_read(15)
+
+def test_pauses_at_high_watermark_and_resumes_at_low_watermark(controller: BackpressureController) -> None:
+    """Reads pause at the high watermark and only resume once drained to the low watermark."""
+    assert not controller.should_read(16)
+    assert not controller.should_read(10)
+    assert not controller.should_read(5)
+    assert controller.should_read(4)
+    assert controller.should_read(10)
+
+def test_pauses_on_slow_commits_while_backlog_builds(controller: BackpressureController) -> None:
+    """Slow commits pause reads once the backlog is above the low watermark."""
+    for _ in range(50):
+        controller.record_commit_latency(5.0)
+
+    assert controller.commit_latency > 0.5
+    assert controller.should_read(4)
+    assert not controller.should_read(5)
+
+def test_forces_single_read_after_max_pause(controller: BackpressureController, clock: FakeClock) -> None:
+    """A single read is allowed each time the pause reaches max_pause, so keepalives are processed."""
+    assert not controller.should_read(16)
+
+    clock.now = 14.9
+    assert not controller.should_read(16)
+    clock.now = 15.0
+    assert controller.should_read(16)
+    assert not controller.should_read(16)
+    clock.now = 30.0
+    assert controller.should_read(16)
+
+def test_commit_latency_is_smoothed(controller: BackpressureController) -> None:
+    """Commit latency is an exponentially weighted moving average."""
+    controller.record_commit_latency(1.0)
+    assert controller.commit_latency == pytest.approx(0.2)
+    controller.record_commit_latency(1.0)
+    assert controller.commit_latency == pytest.approx(0.36)
+
+@pytest.mark.parametrize(
+    ("high_watermark", "low_watermark", "smoothing", "receive_maximum"),
+    [
+        (10, 10, 0.2, None),
+        (10, -1, 0.2, None),
+        (10, 2, 0.0, None),
+        (10, 2, 1.5, None),
+        (21, 4, 0.2, 20),
+    ]
+)
+def test_rejects_invalid_configuration(
+    high_watermark: int,
+    low_watermark: int,
+    smoothing: float,
+    receive_maximum: int | None
+) -> None:
+    """Invalid watermarks, smoothing factors or watermarks beyond Receive Maximum are rejected."""
+    with pytest.raises(BackpressureConfigurationError):
+        BackpressureController(
+            high_watermark=high_watermark,
+            low_watermark=low_watermark,
+            smoothing=smoothing,
+            receive_maximum=receive_maximum
+        )
@@ -0,0 +1,157 @@
+from datetime import datetime, timezone
+from queue import Empty, Queue
+from threading import Thread
+from unittest.mock import MagicMock
+
+import pytest
+from paho.mqtt.client import ConnectFlags, Properties, ReasonCode
+from paho.mqtt.packettypes import PacketTypes
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from mosquitto_consumer import mqtt_consumer_client
+from mosquitto_consumer.config.exceptions import MoistureLogWriterError
+from mosquitto_consumer.database.models import PlantMoistureLog
+from mosquitto_consumer.database.sql_client import SqlClient
+from mosquitto_consumer.mqtt_consumer_client import (
+    PendingMessage,
+    on_connect,
+    run_network_loop,
+    send_pending_acks,
+    write_moisture_logs,
+)
+
+ACK_TIMEOUT_SECONDS = 5
+
+
+def pending_message(mid: int, moisture_perc: int = 60, connection_generation: int = 1) -> PendingMessage:
+    """Build a received message holding a moisture log for plant 1."""
+    return PendingMessage(
+        connection_generation=connection_generation,
+        mid=mid,
+        qos=2,
+        moisture_log_entry=PlantMoistureLog(
+            plant_id=1,
+            created_at=datetime(2026, 1, 1, mid, tzinfo=timezone.utc),
+            adc_value=500,
+            dry_value=800,
+            wet_value=300,
+            moisture_perc=moisture_perc
+        )
+    )
+
+def moisture_log_count(sql_client: SqlClient) -> int:
+    """Count the rows in the moisture log table."""
+    with sql_client.get_session() as session:
+        return session.scalar(select(func.count()).select_from(PlantMoistureLog)) or 0
+
+@pytest.fixture
+def sql_client(monkeypatch: pytest.MonkeyPatch) -> SqlClient:
+    """Replace Postgres with an in-memory SQLite database, without creating the schema."""
+    sqlite_client: SqlClient = SqlClient()
+    sqlite_client.engine = create_engine(
+        "sqlite://",
+        poolclass=StaticPool, # Share the in-memory database with the writer thread
+        connect_args={"check_same_thread": False}
+    )
+    sqlite_client._session = sessionmaker(bind=sqlite_client.engine)
+    monkeypatch.setattr(mqtt_consumer_client, "sql_client", sqlite_client)
+    return sqlite_client
+
+@pytest.fixture
+def ack_queue(monkeypatch: pytest.MonkeyPatch) -> Queue[PendingMessage]:
+    """Give each test its own message queues and a fast database retry."""
+    queue: Queue[PendingMessage] = Queue()
+    monkeypatch.setattr(mqtt_consumer_client, "WRITE_QUEUE", Queue())
+    monkeypatch.setattr(mqtt_consumer_client, "ACK_QUEUE", queue)
+    monkeypatch.setattr(mqtt_consumer_client, "DATABASE_RETRY_MIN_DELAY_SECONDS", 0.01)
+    monkeypatch.setattr(mqtt_consumer_client, "DATABASE_RETRY_MAX_DELAY_SECONDS", 0.01)
+    return queue
+
+@pytest.fixture
+def writer_thread(ack_queue: Queue[PendingMessage]) -> Thread:
+    """Start the database writer thread on the test's queues."""
+    thread: Thread = Thread(target=write_moisture_logs, daemon=True)
+    thread.start()
+    return thread
+
+def test_writer_survives_successful_inserts(
+    sql_client: SqlClient,
+    ack_queue: Queue[PendingMessage],
+    writer_thread: Thread
+) -> None:
+    """Successful inserts are acknowledged and the writer thread keeps processing messages."""
+    sql_client.create_schema()
+
+    for mid in (1, 2):
+        mqtt_consumer_client.WRITE_QUEUE.put(pending_message(mid))
+        assert ack_queue.get(timeout=ACK_TIMEOUT_SECONDS).mid == mid
+
+    assert writer_thread.is_alive()
+    assert moisture_log_count(sql_client) == 2
+
+def test_writer_retries_failed_insert_without_ack(
+    sql_client: SqlClient,
+    ack_queue: Queue[PendingMessage],
+    writer_thread: Thread
+) -> None:
+    """An insert failing with an OperationalError is retried and only acknowledged once written."""
+    mqtt_consumer_client.WRITE_QUEUE.put(pending_message(1)) # No such table until the schema is created
+
+    with pytest.raises(Empty):
+        ack_queue.get(timeout=0.2)
+
+    sql_client.create_schema()
+    assert ack_queue.get(timeout=ACK_TIMEOUT_SECONDS).mid == 1
+    assert moisture_log_count(sql_client) == 1
+
+def test_writer_drops_and_acks_rejected_record(
+    sql_client: SqlClient,
+    ack_queue: Queue[PendingMessage],
+    writer_thread: Thread
+) -> None:
+    """A record rejected by a table constraint is acknowledged without being written or retried."""
+    sql_client.create_schema()
+
+    mqtt_consumer_client.WRITE_QUEUE.put(pending_message(1, moisture_perc=150))
+
+    assert ack_queue.get(timeout=ACK_TIMEOUT_SECONDS).mid == 1
+    assert writer_thread.is_alive()
+    assert moisture_log_count(sql_client) == 0
+
+def test_network_loop_stops_when_writer_thread_stops() -> None:
+    """The network loop raises rather than waiting on a backlog that no thread will drain."""
+    stopped_thread: Thread = Thread(target=lambda: None)
+    stopped_thread.start()
+    stopped_thread.join()
+
+    with pytest.raises(MoistureLogWriterError):
+        run_network_loop(MagicMock(), stopped_thread)
+
+def test_send_pending_acks_skips_previous_sessions(ack_queue: Queue[PendingMessage]) -> None:
+    """Only messages received during the current session are acknowledged."""
+    client: MagicMock = MagicMock()
+    client.user_data_get.return_value = {"connection_generation": 2}
+    ack_queue.put(pending_message(1, connection_generation=1))
+    ack_queue.put(pending_message(2, connection_generation=2))
+
+    send_pending_acks(client)
+
+    client.ack.assert_called_once_with(2, 2)
+    assert ack_queue.empty()
+
+@pytest.mark.parametrize(("session_present", "expected_generation"), [(True, 1), (False, 2)])
+def test_on_connect_starts_new_generation_without_session(session_present: bool, expected_generation: int) -> None:
+    """A resumed session keeps its connection generation so earlier messages can still be acknowledged."""
+    userdata: dict[str, int] = {"connection_generation": 1}
+
+    on_connect(
+        MagicMock(),
+        userdata,
+        ConnectFlags(session_present=session_present),
+        ReasonCode(PacketTypes.CONNACK, "Success"),
+        Properties(PacketTypes.CONNACK)
+    )
+
+    assert userdata["connection_generation"] == expected_generation
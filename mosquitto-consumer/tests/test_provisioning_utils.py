@@ -0,0 +1,202 @@
+from datetime import datetime, timezone
+from typing import Any, Optional
+from unittest.mock import MagicMock
+
+import pytest
+from pydantic import ValidationError
+
+from mosquitto_consumer.config.enums import ProvisioningAction
+from mosquitto_consumer.config.exceptions import PlantNameConflictError
+from mosquitto_consumer.utils import provisioning_utils
+from mosquitto_consumer.utils.provisioning_utils import (
+    PlannedChange,
+    PlantManifest,
+    PlantManifestEntry,
+    ProvisioningPlan,
+    plan_provisioning,
+)
+
+DEPRECATED_AT: datetime = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def manifest_entry(plant_name: str, topic_plant_name: str, **fields: Any) -> dict[str, Any]:  # noqa: ANN401
+    """Build a manifest entry for a plant in the living room."""
+    return {
+        "plant_name": plant_name,
+        "topic_plant_location": "living-room",
+        "topic_plant_name": topic_plant_name,
+        **fields,
+    }
+
+def existing_plant(
+    plant_id: int,
+    plant_name: str,
+    topic_plant_name: str,
+    is_deprecated: bool = False,
+    moisture_range: tuple[Optional[int], Optional[int]] = (None, None)
+) -> dict[str, Any]:
+    """Build a row as selected from the plants and recommended_plant_moisture tables."""
+    return {
+        "id": plant_id,
+        "plant_name": plant_name,
+        "topic": f"plant-monitoring/living-room/{topic_plant_name}/telemetry",
+        "is_deprecated": is_deprecated,
+        "last_deprecated_at": DEPRECATED_AT if is_deprecated else None,
+        "min_moisture_perc": moisture_range[0],
+        "max_moisture_perc": moisture_range[1],
+    }
+
+@pytest.fixture
+def existing_plants(monkeypatch: pytest.MonkeyPatch) -> list[dict[str, Any]]:
+    """Replace the database with a list of plants rows that tests can fill."""
+    rows: list[dict[str, Any]] = []
+    session: MagicMock = MagicMock()
+    session.execute.return_value.mappings.return_value.all.return_value = rows
+    fake_sql_client: MagicMock = MagicMock()
+    fake_sql_client.get_session.return_value.__enter__.return_value = session
+    monkeypatch.setattr(provisioning_utils, "sql_client", fake_sql_client)
+    return rows
+
+def plan(*entries: dict[str, Any], prune: bool = False) -> ProvisioningPlan:
+    """Plan a manifest holding the given entries."""
+    return plan_provisioning(PlantManifest.model_validate({"plants": list(entries)}), prune=prune)
+
+def test_manifest_entry_builds_topic() -> None:
+    """The topic is built from its location and plant name levels."""
+    entry: PlantManifestEntry = PlantManifestEntry.model_validate(manifest_entry("Fern", "fern"))
+
+    assert entry.topic == "plant-monitoring/living-room/fern/telemetry"
+
+@pytest.mark.parametrize(
+    "fields",
+    [
+        {"topic_plant_name": "fern/leaf"},
+        {"topic_plant_name": "#"},
+        {"plant_name": ""},
+        {"min_moisture_perc": 20},
+        {"min_moisture_perc": 60, "max_moisture_perc": 40},
+        {"min_moisture_perc": 20, "max_moisture_perc": 101},
+        {"colour": "green"},
+    ],
+)
+def test_manifest_entry_rejects_invalid_fields(fields: dict[str, Any]) -> None:
+    """Wildcard topics, incomplete or inverted moisture ranges and unknown keys are rejected."""
+    with pytest.raises(ValidationError):
+        PlantManifestEntry.model_validate({**manifest_entry("Fern", "fern"), **fields})
+
+@pytest.mark.parametrize(
+    "entries",
+    [
+        [manifest_entry("Fern", "fern"), manifest_entry("Fern", "cactus")],
+        [manifest_entry("Fern", "fern"), manifest_entry("Cactus", "fern")],
+    ],
+)
+def test_manifest_rejects_duplicate_plants(entries: list[dict[str, Any]]) -> None:
+    """No two plants in a manifest may share a name or topic."""
+    with pytest.raises(ValidationError):
+        PlantManifest.model_validate({"plants": entries})
+
+def test_plan_is_empty_when_plants_match(existing_plants: list[dict[str, Any]]) -> None:
+    """No changes are planned when the tables already match the manifest."""
+    existing_plants.append(existing_plant(1, "Fern", "fern", moisture_range=(30, 60)))
+
+    assert not plan(manifest_entry("Fern", "fern", min_moisture_perc=30, max_moisture_perc=60)).changes
+
+def test_plan_creates_new_plants(existing_plants: list[dict[str, Any]]) -> None:
+    """Plants with an unknown name and topic are inserted with their moisture range."""
+    provisioning_plan: ProvisioningPlan = plan(
+        manifest_entry("Fern", "fern", min_moisture_perc=30, max_moisture_perc=60)
+    )
+
+    assert [change.action for change in provisioning_plan.changes] == [
+        ProvisioningAction.CREATE,
+        ProvisioningAction.SET_RANGE,
+    ]
+    assert provisioning_plan.plant_inserts[0]["plant_name"] == "Fern"
+    assert provisioning_plan.moisture_rows == {
+        "plant-monitoring/living-room/fern/telemetry": {"min_moisture_perc": 30, "max_moisture_perc": 60}
+    }
+
+def test_plan_renames_and_swaps_names(existing_plants: list[dict[str, Any]]) -> None:
+    """Plants matched on topic are renamed, including two plants swapping names."""
+    existing_plants.extend([existing_plant(1, "Fern", "fern"), existing_plant(2, "Cactus", "cactus")])
+
+    provisioning_plan: ProvisioningPlan = plan(manifest_entry("Cactus", "fern"), manifest_entry("Fern", "cactus"))
+
+    assert {change.action for change in provisioning_plan.changes} == {ProvisioningAction.RENAME}
+    assert sorted(provisioning_plan.renamed_ids) == [1, 2]
+    assert not provisioning_plan.plant_inserts
+
+def test_plan_moves_plant_to_new_topic(existing_plants: list[dict[str, Any]]) -> None:
+    """A plant keeping its name under a new topic is moved rather than created."""
+    existing_plants.append(existing_plant(1, "Fern", "fern"))
+
+    provisioning_plan: ProvisioningPlan = plan(manifest_entry("Fern", "big-fern"))
+
+    assert provisioning_plan.changes == [
+        PlannedChange(
+            ProvisioningAction.MOVE,
+            "plant-monitoring/living-room/big-fern/telemetry",
+            "Fern from plant-monitoring/living-room/fern/telemetry"
+        )
+    ]
+    assert provisioning_plan.plant_updates[0]["id"] == 1
+    assert provisioning_plan.renamed_ids == [1]
+
+def test_plan_rejects_name_of_plant_left_out_of_manifest(existing_plants: list[dict[str, Any]]) -> None:
+    """A plant cannot be renamed to the name of an existing plant that is not in the manifest."""
+    existing_plants.extend([existing_plant(1, "Fern", "fern"), existing_plant(2, "Cactus", "cactus")])
+
+    with pytest.raises(PlantNameConflictError, match="Cactus"):
+        plan(manifest_entry("Cactus", "fern"))
+
+def test_plan_deprecates_and_activates_plants(existing_plants: list[dict[str, Any]]) -> None:
+    """Deprecation status follows the manifest and only newly deprecated plants get a new deprecation time."""
+    existing_plants.extend([
+        existing_plant(1, "Fern", "fern"),
+        existing_plant(2, "Cactus", "cactus", is_deprecated=True),
+    ])
+
+    provisioning_plan: ProvisioningPlan = plan(
+        manifest_entry("Fern", "fern", is_deprecated=True),
+        manifest_entry("Cactus", "cactus"),
+    )
+
+    assert [change.action for change in provisioning_plan.changes] == [
+        ProvisioningAction.DEPRECATE,
+        ProvisioningAction.ACTIVATE,
+    ]
+    fern_update, cactus_update = provisioning_plan.plant_updates
+    assert fern_update["last_deprecated_at"] > DEPRECATED_AT
+    assert cactus_update["last_deprecated_at"] == DEPRECATED_AT
+    assert not provisioning_plan.renamed_ids
+
+def test_plan_updates_changed_moisture_range(existing_plants: list[dict[str, Any]]) -> None:
+    """A changed moisture range is upserted without updating the plant itself."""
+    existing_plants.append(existing_plant(1, "Fern", "fern", moisture_range=(30, 60)))
+
+    provisioning_plan: ProvisioningPlan = plan(
+        manifest_entry("Fern", "fern", min_moisture_perc=40, max_moisture_perc=70)
+    )
+
+    assert [change.action for change in provisioning_plan.changes] == [ProvisioningAction.SET_RANGE]
+    assert not provisioning_plan.plant_updates
+    assert provisioning_plan.plant_ids == {"plant-monitoring/living-room/fern/telemetry": 1}
+
+@pytest.mark.parametrize(("prune", "expected_actions"), [(False, []), (True, [ProvisioningAction.DEPRECATE])])
+def test_plan_prunes_only_when_asked(
+    existing_plants: list[dict[str, Any]],
+    prune: bool,
+    expected_actions: list[ProvisioningAction]
+) -> None:
+    """Active plants left out of the manifest are deprecated only with prune, and already deprecated ones never."""
+    existing_plants.extend([
+        existing_plant(1, "Fern", "fern"),
+        existing_plant(2, "Cactus", "cactus"),
+        existing_plant(3, "Orchid", "orchid", is_deprecated=True),
+    ])
+
+    provisioning_plan: ProvisioningPlan = plan(manifest_entry("Fern", "fern"), prune=prune)
+
+    assert [change.action for change in provisioning_plan.changes] == expected_actions
+    assert [row["id"] for row in provisioning_plan.plant_updates] == [2] * len(expected_actions)